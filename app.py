@@ -1,10 +1,49 @@
+import functools
+import itertools
+import logging
 import streamlit as st
 import pandas as pd
 from pptx import Presentation
 from io import BytesIO
 import re
+import time
+from typing import NamedTuple
 import requests
 
+logger = logging.getLogger(__name__)
+
+# ---------------- Placeholder patterns ----------------
+# Compiled once and shared by every shape and table cell in the generation loop
+# [AI: prompt] (may span lines), an unclosed "[AI: prompt" running to the end of
+# the text, or a single-line [Column Name]
+_PLACEHOLDER_RE = re.compile(
+    r"\[AI:\s*(?P<ai>.+?)\]|\[AI:\s*(?P<open>.+)$|\[(?!AI:)(?P<direct>[^\n]+?)\]", re.DOTALL
+)
+
+# ---------------- Prompt patterns ----------------
+# Token handling inside an AI prompt (process_placeholder)
+_TOKEN_RE = re.compile(r"\{\{?([^{}]+?)\}?\}")               # {Token}, {{Token}} or the {{Token} typo
+
+# Prompt analysis (generate_beta_text)
+# "X words", "X-Y sentences", "X paragraphs", ... in one pattern
+_LENGTH_HINT_RE = re.compile(r"(\d+)(?:-(\d+))?\s+(word|sentence|paragraph)s?", re.IGNORECASE)
+_STRUCTURED_RE = re.compile(r"follow this structure|sentence 1:", re.IGNORECASE)
+_QUOTED_RE = re.compile(r'"([^"]+)"')
+_AMOUNT_RE = re.compile(r"\$[\d,]+(?:\s*(?:million|billion|thousand))?", re.IGNORECASE)
+_CAPITALIZED_RE = re.compile(r"\b[A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*\b")
+_TECH_TERM_RE = re.compile(r"\b[a-z]+(?:\s+[a-z]+){1,5}\b")
+# Instruction words the capitalized-phrase scan picks up that are never data values
+_EXCLUDED_CAPITALIZED = frozenset(
+    {'Using', 'Use', 'Write', 'Follow', 'Sentence', 'Do', 'Excel', 'English', 'Initial', 'Future', 'The', 'Based'}
+)
+# Instruction words that rule out a lowercase phrase as a data value
+_TECH_STOPWORDS = ('write', 'using', 'only')
+# Keywords that classify extracted values in structured multi-paragraph output;
+# locations match case-sensitively, the others against the lowercased value
+_LOCATION_WORDS = ('United', 'States', 'Kingdom', 'Europe', 'Asia', 'Africa', 'America')
+_TECHNOLOGY_WORDS = ('solar', 'wind', 'energy', 'power', 'technology', 'system', 'renewable')
+_PARTNER_WORDS = ('contractor', 'provider', 'partner', 'company', 'corp')
+
 # ---------------- Streamlit page config ----------------
 st.set_page_config(page_title="PPTX Teaser Generator with AI", layout="wide")
 st.title("📊 PPTX Teaser Generator with AI")
@@ -34,6 +73,12 @@ missing_to_blank = st.sidebar.checkbox(
     help="If a placeholder column is missing, insert blank instead of an error tag.",
 )
 
+debug_mode = st.sidebar.checkbox(
+    "Debug output",
+    value=False,
+    help="Show per-placeholder diagnostics on the page while generating.",
+)
+
 st.sidebar.divider()
 
 st.sidebar.info(
@@ -60,132 +105,136 @@ Text box formatting is preserved when content is replaced.
 
 
 # ---------------- Smart local text generation ----------------
-def generate_beta_text(prompt_text: str, row_data: pd.Series, tone: str = "short") -> str:
+def _prompt_values(prompt_text: str):
     """
-    Generates text by interpreting the prompt after {token} substitution.
-    Detects length requirements (words, sentences, paragraphs) and follows them.
+    Lazily yield the data values found in a prompt (these replaced the tokens), in order:
+    quoted text, dollar amounts, capitalized phrases, then up to 3 longer descriptive phrases.
+
+    Values are stripped and at least 2 characters long; duplicates are not removed.
     """
-    import re
-    
-    prompt_lower = prompt_text.lower()
-    
-    # Detect specific length requirements in the prompt
-    word_count = None
-    sentence_count = None
-    paragraph_count = None
-    
-    # Look for "X words", "X-Y words"
-    word_match = re.search(r'(\d+)(?:-(\d+))?\s+words?', prompt_lower)
-    if word_match:
-        word_count = (int(word_match.group(1)), int(word_match.group(2) or word_match.group(1)))
-    
-    # Look for "X sentences", "X-Y sentences"
-    sent_match = re.search(r'(\d+)(?:-(\d+))?\s+sentences?', prompt_lower)
-    if sent_match:
-        sentence_count = (int(sent_match.group(1)), int(sent_match.group(2) or sent_match.group(1)))
-    
-    # Look for "X paragraphs", "X-Y paragraphs"
-    para_match = re.search(r'(\d+)(?:-(\d+))?\s+paragraphs?', prompt_lower)
-    if para_match:
-        paragraph_count = (int(para_match.group(1)), int(para_match.group(2) or para_match.group(1)))
-    
-    # Detect content type
-    is_structured = "follow this structure" in prompt_lower or "sentence 1:" in prompt_lower
-    is_professional = "professional" in prompt_lower or "formal" in prompt_lower or "business" in prompt_lower
-    
-    # Extract all the actual data values from the prompt (these replaced the tokens)
-    values = []
-    
+    def cleaned(candidates):
+        for v in candidates:
+            v_clean = v.strip()
+            if len(v_clean) > 1:
+                yield v_clean
+
     # Find quoted text
-    quoted = re.findall(r'"([^"]+)"', prompt_text)
-    values.extend(quoted)
-    
+    yield from cleaned(m.group(1) for m in _QUOTED_RE.finditer(prompt_text))
+
     # Find dollar amounts
-    amounts = re.findall(r'\$[\d,]+(?:\s*(?:million|billion|thousand))?', prompt_text, re.IGNORECASE)
-    values.extend(amounts)
-    
+    yield from cleaned(m.group(0) for m in _AMOUNT_RE.finditer(prompt_text))
+
     # Find capitalized multi-word phrases
-    capitalized = re.findall(r'\b[A-Z][a-zA-Z]+(?:\s+[A-Z][a-zA-Z]+)*\b', prompt_text)
-    excluded = {'Using', 'Use', 'Write', 'Follow', 'Sentence', 'Do', 'Excel', 'English', 'Initial', 'Future', 'The', 'Based'}
-    capitalized = [c for c in capitalized if c not in excluded and len(c) > 2]
-    values.extend(capitalized)
-    
+    yield from cleaned(
+        c for c in (m.group(0) for m in _CAPITALIZED_RE.finditer(prompt_text))
+        if c not in _EXCLUDED_CAPITALIZED and len(c) > 2
+    )
+
     # Find longer descriptive phrases (likely field values)
-    technical_terms = re.findall(r'\b[a-z]+(?:\s+[a-z]+){1,5}\b', prompt_text)
-    technical_terms = [t for t in technical_terms if len(t) > 15 and 'write' not in t and 'using' not in t and 'only' not in t]
-    values.extend(technical_terms[:3])
+    technical_terms = (
+        t for t in (m.group(0) for m in _TECH_TERM_RE.finditer(prompt_text))
+        if len(t) > 15 and not any(w in t for w in _TECH_STOPWORDS)
+    )
+    yield from cleaned(itertools.islice(technical_terms, 3))
+
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def generate_beta_text(prompt_text: str, tone: str = "short") -> str:
+    """
+    Generates text by interpreting the prompt after {token} substitution.
+    Detects length requirements (words, sentences, paragraphs) and follows them.
+
+    The output depends only on the substituted prompt, so it is cached across
+    rows and reruns: rows that share values (same country, industry, ...)
+    produce identical prompts and are generated once.
+    """
+    # Detect specific length requirements in the prompt ("X words", "X-Y sentences",
+    # "X paragraphs") in one case-insensitive scan; the first hint of each kind wins.
+    length_hints = {}
+    for m in _LENGTH_HINT_RE.finditer(prompt_text):
+        unit = m.group(3).lower()
+        if unit not in length_hints:
+            length_hints[unit] = (int(m.group(1)), int(m.group(2) or m.group(1)))
+
+    word_count = length_hints.get("word")
+    sentence_count = length_hints.get("sentence")
+    paragraph_count = length_hints.get("paragraph")
+    
+    # Very short: 3-10 words. Only the first data value is used, so stop at the
+    # first hit instead of running every extraction pattern over the prompt.
+    if word_count and word_count[1] <= 10:
+        return next(_prompt_values(prompt_text), "Professional solutions")
+
+    # Detect content type
+    is_structured = _STRUCTURED_RE.search(prompt_text) is not None
     
     # Remove duplicates
     seen = set()
     unique_values = []
-    for v in values:
-        v_clean = v.strip()
-        if v_clean and v_clean not in seen and len(v_clean) > 1:
-            seen.add(v_clean)
-            unique_values.append(v_clean)
+    for v in _prompt_values(prompt_text):
+        if v not in seen:
+            seen.add(v)
+            unique_values.append(v)
     
     # Generate content based on requirements
-    if word_count and word_count[1] <= 10:
-        # Very short: 3-10 words
-        if len(unique_values) >= 1:
-            return unique_values[0]
-        else:
-            return "Professional solutions"
-    
-    elif is_structured and paragraph_count:
+    if is_structured and paragraph_count:
         # Structured multi-paragraph request
         paragraphs = []
         
-        # Identify key components
+        # Only the first three paragraphs have content, so build exactly those that
+        # were asked for and classify the values each one needs.
+        wanted = paragraph_count[1]
         client = "The client"
-        location = next((v for v in unique_values if any(place in v for place in ['United', 'States', 'Kingdom', 'Europe', 'Asia', 'Africa', 'America'])), None)
-        technology = next((v for v in unique_values if any(tech in v.lower() for tech in ['solar', 'wind', 'energy', 'power', 'technology', 'system', 'renewable'])), None)
-        partners = [v for v in unique_values if any(word in v.lower() for word in ['contractor', 'provider', 'partner', 'company', 'corp'])]
-        amounts_list = [v for v in unique_values if '$' in v]
-        descriptions = [v for v in unique_values if len(v) > 40]
-        
-        # Build paragraphs
-        for i in range(paragraph_count[1]):
+        lowered = [(v, v.lower()) for v in unique_values]
+
+        if wanted >= 1:
+            # First paragraph: Introduction
+            location = next((v for v in unique_values if any(place in v for place in _LOCATION_WORDS)), None)
+            technology = next((v for v, lc in lowered if any(tech in lc for tech in _TECHNOLOGY_WORDS)), None)
+            descriptions = [v for v in unique_values if len(v) > 40]
             sentences = []
+
+            if technology and location:
+                sentences.append(f"{client} is developing a {technology} project in {location}.")
+            elif technology:
+                sentences.append(f"{client} is developing a {technology} project.")
+            elif len(unique_values) >= 2:
+                sentences.append(f"{client} is undertaking {unique_values[0]} in {unique_values[1]}.")
+            else:
+                sentences.append(f"{client} is pursuing a strategic development initiative.")
             
-            if i == 0:
-                # First paragraph: Introduction
-                if technology and location:
-                    sentences.append(f"{client} is developing a {technology} project in {location}.")
-                elif technology:
-                    sentences.append(f"{client} is developing a {technology} project.")
-                elif len(unique_values) >= 2:
-                    sentences.append(f"{client} is undertaking {unique_values[0]} in {unique_values[1]}.")
-                else:
-                    sentences.append(f"{client} is pursuing a strategic development initiative.")
-                
-                if descriptions:
-                    sentences.append(f"The project encompasses {descriptions[0].lower()}.")
-                elif len(unique_values) >= 3:
-                    sentences.append(f"This involves {unique_values[2].lower()}.")
-            
-            elif i == 1:
-                # Second paragraph: Development/Partners
-                if partners:
-                    partner_text = " and ".join(partners[:2])
-                    sentences.append(f"The project will be developed in collaboration with {partner_text}.")
-                    sentences.append(f"These partnerships ensure successful delivery and operation.")
-                else:
-                    sentences.append(f"The initiative leverages proven methodologies and industry expertise.")
-                    sentences.append(f"Development will proceed in phases to ensure optimal outcomes.")
-            
-            elif i == 2:
-                # Third paragraph: Investment/Financial
-                if len(amounts_list) >= 2:
-                    sentences.append(f"The initial investment is {amounts_list[0]}, with planned expansion investment of {amounts_list[1]}.")
-                elif len(amounts_list) == 1:
-                    sentences.append(f"The project represents an investment of {amounts_list[0]}.")
-                else:
-                    sentences.append(f"The project is backed by substantial capital commitment.")
-                sentences.append(f"This financial structure supports both immediate development and future growth.")
-            
-            if sentences:
-                paragraphs.append(" ".join(sentences))
+            if descriptions:
+                sentences.append(f"The project encompasses {descriptions[0].lower()}.")
+            elif len(unique_values) >= 3:
+                sentences.append(f"This involves {unique_values[2].lower()}.")
+
+            paragraphs.append(" ".join(sentences))
+
+        if wanted >= 2:
+            # Second paragraph: Development/Partners
+            partners = [v for v, lc in lowered if any(word in lc for word in _PARTNER_WORDS)]
+            if partners:
+                partner_text = " and ".join(partners[:2])
+                paragraphs.append(
+                    f"The project will be developed in collaboration with {partner_text}. "
+                    "These partnerships ensure successful delivery and operation."
+                )
+            else:
+                paragraphs.append(
+                    "The initiative leverages proven methodologies and industry expertise. "
+                    "Development will proceed in phases to ensure optimal outcomes."
+                )
+
+        if wanted >= 3:
+            # Third paragraph: Investment/Financial
+            amounts_list = [v for v in unique_values if '$' in v]
+            if len(amounts_list) >= 2:
+                opening = f"The initial investment is {amounts_list[0]}, with planned expansion investment of {amounts_list[1]}."
+            elif len(amounts_list) == 1:
+                opening = f"The project represents an investment of {amounts_list[0]}."
+            else:
+                opening = "The project is backed by substantial capital commitment."
+            paragraphs.append(f"{opening} This financial structure supports both immediate development and future growth.")
         
         return "\n\n".join(paragraphs)
     
@@ -227,70 +276,339 @@ def generate_beta_text(prompt_text: str, row_data: pd.Series, tone: str = "short
 
 
 # -------- Placeholder logic --------
+def build_row_map(excel_columns: frozenset, row_data: pd.Series) -> dict:
+    """Map the text of a {Token} to the row's cell value as a string (NaN → "")."""
+    row_map = {}
+    for col in excel_columns:
+        if col in row_data.index:
+            val = row_data[col]
+            row_map[str(col)] = "" if pd.isna(val) else str(val)
+    return row_map
+
+
 def process_placeholder(
     placeholder: str,
     row_data: pd.Series,
-    excel_columns: list,
+    excel_columns: frozenset,
     beta_tone: str,
     missing_to_blank: bool,
+    row_map: dict = None,
+    missing_columns: set = None,
 ) -> str:
     """
     Resolve a placeholder to final text using smart local generation.
 
     - Direct: "Title" → row_data["Title"]
     - AI: "AI: Write teaser about {Company}" → smart text generation with Excel values.
+
+    `row_map` maps column name to the row's value as text (see build_row_map);
+    pass it in when resolving many placeholders for the same row so it is built
+    only once.
+    `missing_columns`, when given, collects unknown {Token} names so the caller
+    can report them once instead of warning per prompt.
     """
+    if row_map is None:
+        row_map = build_row_map(excel_columns, row_data)
+
     # AI placeholder - always use local generation
     if placeholder.startswith("AI:"):
-        import re
-        
         prompt_text = placeholder[3:].strip()
         
         # Handle double "AI:" at the start (common error)
         if prompt_text.startswith("AI:"):
             prompt_text = prompt_text[3:].strip()
 
-        # Track which tokens couldn't be found
+        # Replace {{ColumnName}} / {ColumnName} (and the common {{ColumnName} typo)
+        # with values from the Excel row in a single pass. Tokens with no matching
+        # column are blanked and reported rather than left in the prompt.
         missing_tokens = []
-        
-        # Replace {{ColumnName}} or {ColumnName} with actual values from Excel row
-        for col in excel_columns:
-            if col in row_data.index:
-                value = "" if pd.isna(row_data[col]) else str(row_data[col])
-                # Support both {{}} and {} formats
-                prompt_text = prompt_text.replace(f"{{{{{col}}}}}", value)  # {{ColumnName}}
-                prompt_text = prompt_text.replace(f"{{{col}}}", value)       # {ColumnName}
-        
-        # Fix common typos: {{TOKEN} with only one closing brace
-        prompt_text = re.sub(r'\{\{([^}]+)\}(?!\})', r'{{\1}}', prompt_text)
-        
-        # Find remaining unreplaced tokens to report to user
-        remaining_tokens = re.findall(r'\{\{([^}]+)\}\}', prompt_text)
-        remaining_tokens.extend(re.findall(r'\{([^}]+)\}', prompt_text))
-        
-        if remaining_tokens:
-            st.warning(f"⚠️ Missing Excel columns: {', '.join(set(remaining_tokens))}. Add these columns to your Excel or remove from prompt.")
-        
-        # Replace any remaining {{TOKEN}} or {TOKEN} with blank instead of error message
-        prompt_text = re.sub(r'\{\{[^}]+\}\}', '', prompt_text)
-        prompt_text = re.sub(r'\{[^}]+\}', '', prompt_text)
 
-        st.write(f"🔍 DEBUG - After token replacement: '{prompt_text[:200]}...'")
+        def fill_token(match):
+            value = row_map.get(match.group(1))
+            if value is None:
+                missing_tokens.append(match.group(1))
+                return ""
+            return value
+
+        prompt_text = _TOKEN_RE.sub(fill_token, prompt_text)
+
+        if missing_tokens:
+            if missing_columns is not None:
+                missing_columns.update(missing_tokens)
+            else:
+                st.warning(f"⚠️ Missing Excel columns: {', '.join(dict.fromkeys(missing_tokens))}. Add these columns to your Excel or remove from prompt.")
+
+        logger.debug("After token replacement: %r", prompt_text[:200])
+        if debug_mode:
+            st.write(f"🔍 DEBUG - After token replacement: '{prompt_text[:200]}...'")
         
-        generated = generate_beta_text(prompt_text, row_data, beta_tone)
+        generated = generate_beta_text(prompt_text, beta_tone)
         
-        st.write(f"✅ DEBUG - Generated text: '{generated[:200]}...'")
+        logger.debug("Generated text: %r", generated[:200])
+        if debug_mode:
+            st.write(f"✅ DEBUG - Generated text: '{generated[:200]}...'")
         return generated
 
     # Direct placeholder
     col_name = placeholder.strip()
-    if col_name in row_data.index:
-        val = row_data[col_name]
-        return "" if pd.isna(val) else str(val)
+    value = row_map.get(col_name)
+    if value is not None:
+        return value
     else:
         return "" if missing_to_blank else f"[MISSING COLUMN: {col_name}]"
 
 
+def make_resolver(
+    row_data: pd.Series,
+    excel_columns: frozenset,
+    beta_tone: str,
+    missing_to_blank: bool,
+    missing_columns: set = None,
+):
+    """
+    Bind process_placeholder to one Excel row and memoize it.
+
+    A placeholder repeated across slides (e.g. [Company] or the same [AI: ...]
+    prompt) is resolved once per generation run instead of once per occurrence.
+    Unknown {Token} names are collected into `missing_columns` if given.
+    """
+    row_map = build_row_map(excel_columns, row_data)
+
+    @functools.lru_cache(maxsize=1024)
+    def resolve(placeholder: str) -> str:
+        return process_placeholder(
+            placeholder,
+            row_data,
+            excel_columns,
+            beta_tone,
+            missing_to_blank,
+            row_map,
+            missing_columns,
+        )
+
+    return resolve
+
+
+# -------- Formatting helpers --------
+class FontSnapshot(NamedTuple):
+    """Run formatting read once, so it survives text_frame.clear()."""
+
+    size: object
+    name: object
+    bold: object
+    italic: object
+    rgb: object
+
+
+def snapshot_font(font) -> FontSnapshot:
+    """Read each font attribute (an lxml lookup in python-pptx) exactly once."""
+    try:
+        rgb = font.color.rgb
+    except (AttributeError, TypeError):
+        # No explicit RGB (inherited, theme or no color)
+        rgb = None
+    return FontSnapshot(font.size, font.name, font.bold, font.italic, rgb)
+
+
+def apply_font(font, snap: FontSnapshot) -> None:
+    """Re-apply a snapshot to a new run's font, skipping inherited (unset) values."""
+    if snap.size:
+        font.size = snap.size
+    if snap.name:
+        font.name = snap.name
+    if snap.bold is not None:
+        font.bold = snap.bold
+    if snap.italic is not None:
+        font.italic = snap.italic
+    if snap.rgb is not None:
+        font.color.rgb = snap.rgb
+
+
+# -------- Progress reporting --------
+class ProgressReporter:
+    """
+    Progress bar plus status line for the generation loop.
+
+    Every widget update is a websocket delta, so both are pushed together at most
+    ~30 times per second; pass force=True to push the latest state immediately.
+    """
+
+    MIN_INTERVAL = 1 / 30  # seconds
+
+    def __init__(self, total: int):
+        self.total = total
+        self.processed = 0
+        self._bar = st.progress(0.0)
+        self._status = st.empty()
+        self._message = None
+        self._shown_message = None
+        self._last_push = 0.0
+
+    def advance(self, count: int = 1) -> None:
+        """Count finished shapes/cells."""
+        self.processed += count
+        self._push()
+
+    def status(self, message: str, force: bool = False) -> None:
+        """Set the status line text."""
+        self._message = message
+        self._push(force)
+
+    def _push(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_push < self.MIN_INTERVAL:
+            return
+        self._last_push = now
+        self._bar.progress(self.processed / max(self.total, 1))
+        if self._message != self._shown_message:
+            self._status.text(self._message)
+            self._shown_message = self._message
+
+
+# -------- Text filling --------
+def has_bracket(element) -> bool:
+    """
+    True if any text run under this XML element contains "[".
+
+    One XPath walk over the raw <a:t> strings; unlike shape.text / cell.text it
+    doesn't build paragraph and run proxies, so static text is rejected cheaply.
+    """
+    return any("[" in t for t in element.xpath(".//a:t/text()"))
+
+
+def fill_placeholders(text: str, resolve, reporter: ProgressReporter) -> str:
+    """
+    Replace every placeholder in `text` in a single re.sub pass.
+
+    `resolve` maps a placeholder body ("Title" or "AI: ...") to its text (see
+    make_resolver); `reporter` shows which prompt is being generated.
+    """
+
+    def replace(m):
+        direct = m.group("direct")
+        if direct is not None:
+            return resolve(direct)
+
+        if m.group("open") is not None:
+            st.warning(f"⚠️ Found AI placeholder without closing bracket ]")
+        ai_prompt = m.group("ai") if m.group("ai") is not None else m.group("open")
+        reporter.status(f"🤖 Generating text: {ai_prompt[:60]}...")
+        replacement = resolve(f"AI: {ai_prompt}")
+        logger.debug("Original=[AI: %s], Replacement=%s", ai_prompt, replacement[:100])
+        if debug_mode:
+            st.write(f"DEBUG: Original=[AI: {ai_prompt}], Replacement={replacement[:100]}")
+        return replacement
+
+    return _PLACEHOLDER_RE.sub(replace, text)
+
+
+def write_text_preserving_format(target, original_text: str, new_text: str) -> None:
+    """
+    Put `new_text` into a shape or table cell, keeping its first run's formatting.
+
+    `target` is anything with `.text` and `.text_frame` (a text shape or a cell).
+    """
+    text_frame = target.text_frame
+    paragraphs = text_frame.paragraphs
+    if not paragraphs:
+        target.text = new_text
+    elif (
+        len(paragraphs) == 1
+        and len(paragraphs[0].runs) == 1
+        and paragraphs[0].runs[0].text == original_text
+    ):
+        # Whole text lives in one run: swap it in place, formatting untouched
+        paragraphs[0].runs[0].text = new_text
+    else:
+        para = paragraphs[0]
+        if para.runs:
+            font_snap = snapshot_font(para.runs[0].font)
+
+            text_frame.clear()
+            new_para = text_frame.paragraphs[0]
+            new_run = new_para.add_run()
+            new_run.text = new_text
+            apply_font(new_run.font, font_snap)
+
+            new_para.alignment = para.alignment
+            new_para.level = para.level
+        else:
+            target.text = new_text
+
+
+# -------- Cached file parsing --------
+# Keyed on upload bytes and shared by all sessions, so every cache here is bounded:
+# parsed files (images and all) keep a few recent uploads for an hour, the small
+# per-upload summaries a few more.
+@st.cache_resource(max_entries=4, ttl=3600, show_spinner=False)
+def load_template(raw: bytes) -> Presentation:
+    """
+    Parse an uploaded template once per distinct upload instead of on every rerun.
+
+    The object is shared across reruns, so treat it as read-only; generation
+    parses its own copy to fill in.
+    """
+    return Presentation(BytesIO(raw))
+
+
+@st.cache_data(max_entries=16, ttl=3600, show_spinner=False)
+def template_outline(raw: bytes) -> list:
+    """
+    Per-slide list of (shape index, kind, name, detail) for the template inspector.
+
+    kind is "text" (detail: first 80 characters) or "table" (detail: row count).
+    Built once per upload so changing the inspected slide doesn't walk shapes again.
+    """
+    outline = []
+    for slide in load_template(raw).slides:
+        entries = []
+        for idx, shape in enumerate(slide.shapes):
+            if shape.has_text_frame:
+                entries.append((idx, "text", shape.name, shape.text[:80]))
+            elif shape.has_table:
+                entries.append((idx, "table", shape.name, len(shape.table.rows)))
+        outline.append(entries)
+    return outline
+
+
+@st.cache_data(max_entries=16, ttl=3600, show_spinner=False)
+def placeholder_slides(raw: bytes) -> frozenset:
+    """
+    Indices of the slides whose text contains a "[" (i.e. may hold a placeholder).
+
+    One C-level XPath walk over each slide's text runs, done once per upload so
+    repeated generations (e.g. for different rows) skip static slides for free.
+    """
+    return frozenset(
+        idx
+        for idx, slide in enumerate(load_template(raw).slides)
+        if has_bracket(slide.element)
+    )
+
+
+@st.cache_data(max_entries=16, ttl=3600, show_spinner=False)
+def slide_work_units(raw: bytes) -> tuple:
+    """
+    Progress units per slide: one per shape, except a table counts one per cell.
+
+    Matches what the generation loop advances by, so the progress total is fixed
+    up front and the bar never moves backwards when a table is reached.
+    """
+    return tuple(
+        sum(
+            sum(len(r.cells) for r in shape.table.rows) if shape.has_table else 1
+            for shape in slide.shapes
+        )
+        for slide in load_template(raw).slides
+    )
+
+
+@st.cache_data(max_entries=4, ttl=3600, show_spinner=False)
+def load_excel(raw: bytes) -> pd.DataFrame:
+    """Parse an uploaded workbook once per distinct upload instead of on every rerun."""
+    return pd.read_excel(BytesIO(raw))
+
+
 # ---------------- File uploads ----------------
 col1, col2 = st.columns(2)
 
@@ -315,23 +633,22 @@ with col2:
 if template_file:
     with st.expander("🔍 Inspect template text boxes (optional)"):
         try:
-            prs_preview = Presentation(template_file)
-            st.write(f"Slides: **{len(prs_preview.slides)}**")
+            outline = template_outline(template_file.getvalue())
+            st.write(f"Slides: **{len(outline)}**")
             slide_index = st.selectbox(
                 "Slide to inspect",
-                options=range(len(prs_preview.slides)),
+                options=range(len(outline)),
                 format_func=lambda i: f"Slide {i+1}",
             )
-            slide = prs_preview.slides[slide_index]
             st.write(f"**Shapes on Slide {slide_index + 1}:**")
 
-            for idx, shape in enumerate(slide.shapes):
+            for idx, kind, name, detail in outline[slide_index]:
                 # Show text from text shapes and table cells
-                if hasattr(shape, "text_frame"):
-                    st.write(f"- Shape {idx} name: `{shape.name}`")
-                    st.write(f"  Text: `{shape.text[:80]}`")
-                elif getattr(shape, "has_table", False):
-                    st.write(f"- Table {idx} with {len(shape.table.rows)} rows")
+                if kind == "text":
+                    st.write(f"- Shape {idx} name: `{name}`")
+                    st.write(f"  Text: `{detail}`")
+                else:
+                    st.write(f"- Table {idx} with {detail} rows")
         except Exception as e:
             st.error(f"Error inspecting template: {e}")
 
@@ -342,7 +659,7 @@ if template_file and excel_file:
 
     # Read Excel
     try:
-        df = pd.read_excel(excel_file)
+        df = load_excel(excel_file.getvalue())
     except Exception as e:
         st.error(f"Error reading Excel: {e}")
         st.stop()
@@ -354,9 +671,9 @@ if template_file and excel_file:
     st.subheader("📋 Excel preview")
     st.dataframe(df, use_container_width=True)
 
-    # Load PPTX template
+    # Validate PPTX template (cached parse; generation works on its own copy)
     try:
-        prs = Presentation(template_file)
+        load_template(template_file.getvalue())
     except Exception as e:
         st.error(f"Error loading PPTX template: {e}")
         st.stop()
@@ -373,223 +690,88 @@ if template_file and excel_file:
 
     # Button to generate
     if st.button("🚀 Generate PPTX", type="primary"):
-        excel_columns = df.columns.tolist()
+        # Hashable column set; build_row_map turns it into the per-row lookup dict
+        excel_columns = frozenset(df.columns)
         row_data = df.iloc[row_index]
+        missing_columns = set()
+        resolve = make_resolver(row_data, excel_columns, beta_tone, missing_to_blank, missing_columns)
 
         try:
-            # Count targets: text boxes + table cells
-            def count_text_targets(pres: Presentation) -> int:
-                total = 0
-                for s in pres.slides:
-                    for shp in s.shapes:
-                        if hasattr(shp, "text_frame"):
-                            total += 1
-                        elif getattr(shp, "has_table", False):
-                            tbl = shp.table
-                            for r in tbl.rows:
-                                total += len(r.cells)
-                return total
-
-            total_targets = count_text_targets(prs)
-            processed = 0
-            progress = st.progress(0.0)
-            status = st.empty()
-
-            for slide in prs.slides:
+            template_bytes = template_file.getvalue()
+            prs = Presentation(BytesIO(template_bytes))
+            slides_to_fill = placeholder_slides(template_bytes)
+            slide_units = slide_work_units(template_bytes)
+
+            # Progress denominator: one unit per shape or table cell, counted once
+            # per upload on the cached template
+            reporter = ProgressReporter(sum(slide_units))
+
+            for slide_idx, slide in enumerate(prs.slides):
+                # A slide with no "[" anywhere has no placeholders, so skip building
+                # its shape/cell proxies (the scan is cached per upload)
+                if slide_idx not in slides_to_fill:
+                    reporter.advance(slide_units[slide_idx])
+                    continue
+
                 for shape in slide.shapes:
+                    # python-pptx exposes both capabilities as plain properties; read each once
+                    has_text_frame = shape.has_text_frame
+                    has_table = shape.has_table
+
                     # Debug: show what type of shape we're looking at
-                    st.write(f"🔍 Found shape: {shape.name} (has text_frame: {hasattr(shape, 'text_frame')}, has_table: {getattr(shape, 'has_table', False)})")
-                    
-                    # Skip shapes without text capability
-                    if not hasattr(shape, "text_frame") and not getattr(shape, "has_table", False):
-                        processed += 1
-                        progress.progress(processed / max(total_targets, 1))
-                        continue
+                    if debug_mode:
+                        st.write(f"🔍 Found shape: {shape.name} (has text_frame: {has_text_frame}, has_table: {has_table})")
                     
                     # Handle tables
-                    if getattr(shape, "has_table", False):
+                    if has_table:
                         table = shape.table
                         for r in table.rows:
                             for cell in r.cells:
-                                original_text = cell.text
-                                if not original_text:
-                                    processed += 1
-                                    progress.progress(processed / max(total_targets, 1))
-                                    continue
-
-                                ai_matches = re.findall(r"\[AI:\s*(.+?)\]", original_text)
-                                direct_matches = re.findall(r"\[(?!AI:)(.+?)\]", original_text)
-
-                                if not direct_matches and not ai_matches:
-                                    processed += 1
-                                    progress.progress(processed / max(total_targets, 1))
-                                    continue
-
-                                new_text = original_text
-
-                                for placeholder in direct_matches:
-                                    replacement = process_placeholder(
-                                        placeholder,
-                                        row_data,
-                                        excel_columns,
-                                        beta_tone,
-                                        missing_to_blank,
-                                    )
-                                    new_text = new_text.replace(f"[{placeholder}]", replacement)
-
-                                for ai_prompt in ai_matches:
-                                    status.text(f"🤖 Generating text: {ai_prompt[:60]}...")
-                                    replacement = process_placeholder(
-                                        f"AI: {ai_prompt}",
-                                        row_data,
-                                        excel_columns,
-                                        beta_tone,
-                                        missing_to_blank,
-                                    )
-                                    st.write(f"DEBUG: Original=[AI: {ai_prompt}], Replacement={replacement[:100]}")
-                                    new_text = new_text.replace(f"[AI: {ai_prompt}]", replacement)
-
-                                if new_text != original_text:
-                                    tf = cell.text_frame
-                                    if not tf.paragraphs:
-                                        cell.text = new_text
-                                    else:
-                                        para = tf.paragraphs[0]
-                                        if para.runs:
-                                            run0 = para.runs[0]
-                                            font = run0.font
-
-                                            tf.clear()
-                                            new_para = tf.paragraphs[0]
-                                            new_run = new_para.add_run()
-                                            new_run.text = new_text
-
-                                            if font.size:
-                                                new_run.font.size = font.size
-                                            if font.name:
-                                                new_run.font.name = font.name
-                                            if font.bold is not None:
-                                                new_run.font.bold = font.bold
-                                            if font.italic is not None:
-                                                new_run.font.italic = font.italic
-                                            if font.color and hasattr(font.color, 'rgb'):
-                                                new_run.font.color.rgb = font.color.rgb
-
-                                            new_para.alignment = para.alignment
-                                            new_para.level = para.level
-                                        else:
-                                            cell.text = new_text
-
-                                processed += 1
-                                progress.progress(processed / max(total_targets, 1))
+                                # Empty or static text can't hold a placeholder
+                                if has_bracket(cell._tc):
+                                    original_text = cell.text
+                                    new_text = fill_placeholders(original_text, resolve, reporter)
+                                    if new_text != original_text:
+                                        write_text_preserving_format(cell, original_text, new_text)
+
+                                reporter.advance()
 
                         # Move to next shape
                         continue
 
-                    # Handle regular text shapes (text boxes, rectangles, etc.)
-                    # Most shapes with text will have a text_frame attribute
-                    if not hasattr(shape, "text_frame"):
-                        processed += 1
-                        progress.progress(processed / max(total_targets, 1))
+                    # Handle regular text shapes (text boxes, rectangles, etc.);
+                    # skip pictures, charts and other shapes without text capability
+                    if not has_text_frame:
+                        reporter.advance()
                         continue
 
-                    original_text = shape.text
-                    if not original_text:
-                        processed += 1
-                        progress.progress(processed / max(total_targets, 1))
-                        continue
+                    # Empty or static text can't hold a placeholder
+                    if has_bracket(shape.element):
+                        original_text = shape.text
+                        if debug_mode:
+                            st.write(f"  📝 Shape text preview: '{original_text[:100]}...'")
 
-                    st.write(f"  📝 Shape text preview: '{original_text[:100]}...'")
-                    
-                    # More forgiving regex that handles multi-line and missing closing brackets
-                    # First try standard format: [AI: ... ]
-                    ai_matches = re.findall(r"\[AI:\s*(.+?)\]", original_text, re.DOTALL)
-                    
-                    # If no matches, try without closing bracket (for malformed placeholders)
-                    if not ai_matches:
-                        ai_no_close = re.findall(r"\[AI:\s*(.+)$", original_text, re.DOTALL)
-                        if ai_no_close:
-                            st.warning(f"⚠️ Found AI placeholder without closing bracket ]")
-                            ai_matches = ai_no_close
-                    
-                    direct_matches = re.findall(r"\[(?!AI:)(.+?)\]", original_text)
+                        new_text = fill_placeholders(original_text, resolve, reporter)
+                        if new_text != original_text:
+                            write_text_preserving_format(shape, original_text, new_text)
 
-                    st.write(f"  🎯 Found {len(ai_matches)} AI placeholders, {len(direct_matches)} direct placeholders")
+                    reporter.advance()
 
-                    if not direct_matches and not ai_matches:
-                        processed += 1
-                        progress.progress(processed / max(total_targets, 1))
-                        continue
 
-                    new_text = original_text
-
-                    for placeholder in direct_matches:
-                        replacement = process_placeholder(
-                            placeholder,
-                            row_data,
-                            excel_columns,
-                            beta_tone,
-                            missing_to_blank,
-                        )
-                        new_text = new_text.replace(f"[{placeholder}]", replacement)
-
-                    for ai_prompt in ai_matches:
-                        status.text(f"🤖 Generating text: {ai_prompt[:60]}...")
-                        replacement = process_placeholder(
-                            f"AI: {ai_prompt}",
-                            row_data,
-                            excel_columns,
-                            beta_tone,
-                            missing_to_blank,
-                        )
-                        st.write(f"DEBUG: Original=[AI: {ai_prompt}], Replacement={replacement[:100]}")
-                        new_text = new_text.replace(f"[AI: {ai_prompt}]", replacement)
-
-                    if new_text != original_text:
-                        text_frame = shape.text_frame
-                        if not text_frame.paragraphs:
-                            shape.text = new_text
-                        else:
-                            para = text_frame.paragraphs[0]
-                            if para.runs:
-                                run0 = para.runs[0]
-                                font = run0.font
-
-                                text_frame.clear()
-                                new_para = text_frame.paragraphs[0]
-                                new_run = new_para.add_run()
-                                new_run.text = new_text
-
-                                if font.size:
-                                    new_run.font.size = font.size
-                                if font.name:
-                                    new_run.font.name = font.name
-                                if font.bold is not None:
-                                    new_run.font.bold = font.bold
-                                if font.italic is not None:
-                                    new_run.font.italic = font.italic
-                                if font.color and hasattr(font.color, 'rgb'):
-                                    new_run.font.color.rgb = font.color.rgb
-
-                                new_para.alignment = para.alignment
-                                new_para.level = para.level
-                            else:
-                                shape.text = new_text
-
-                    processed += 1
-                    progress.progress(processed / max(total_targets, 1))
-
-            progress.progress(1.0)
-            status.text("✅ Done")
+            if missing_columns:
+                st.warning(f"⚠️ Missing Excel columns: {', '.join(sorted(missing_columns))}. Add these columns to your Excel or remove from prompt.")
 
+            # Saving re-serializes every slide; say so rather than sitting at 100%
+            reporter.processed = reporter.total
+            reporter.status("💾 Finalizing PPTX...", force=True)
             output = BytesIO()
             prs.save(output)
-            output.seek(0)
+            reporter.status("✅ Done", force=True)
 
             st.success("✅ PPTX generated successfully!")
             st.download_button(
                 label="📥 Download filled PPTX",
-                data=output.getvalue(),
+                data=output,
                 file_name="teaser_filled.pptx",
                 mime=(
                     "application/"
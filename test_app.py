@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Checks for the placeholder handling in app.py (imports the real module).
+
+Run with `python -m pytest test_app.py` or `python test_app.py`. Importing app
+executes the Streamlit script in bare mode; no uploads are present, so only
+the module-level helpers are set up.
+"""
+
+from io import BytesIO
+
+import pandas as pd
+from pptx import Presentation
+from pptx.util import Inches
+
+import app
+
+
+ROW = pd.DataFrame([{
+    "Title": "Revolutionary Platform",
+    "Company": "TechCorp",
+    "Industry": "Cloud Computing",
+}]).iloc[0]
+COLUMNS = frozenset(ROW.index)
+
+
+class RecordingReporter:
+    """Stands in for ProgressReporter; fill_placeholders only sets status text."""
+
+    def __init__(self):
+        self.messages = []
+
+    def status(self, message, force=False):
+        self.messages.append(message)
+
+
+def resolver(row=ROW, missing_to_blank=True, missing_columns=None):
+    return app.make_resolver(row, frozenset(row.index), "short", missing_to_blank, missing_columns)
+
+
+def groups(text):
+    """(kind, body) for each _PLACEHOLDER_RE match in text."""
+    found = []
+    for m in app._PLACEHOLDER_RE.finditer(text):
+        kind = next(k for k in ("ai", "open", "direct") if m.group(k) is not None)
+        found.append((kind, m.group(kind)))
+    return found
+
+
+# ---------------- _PLACEHOLDER_RE / fill_placeholders ----------------
+def test_direct_and_ai_placeholders_are_matched():
+    assert groups("Title: [Title] - [AI: Write about {Company}]") == [
+        ("direct", "Title"),
+        ("ai", "Write about {Company}"),
+    ]
+
+
+def test_ai_prompt_may_span_lines():
+    assert groups("[AI: Write 5 words\nabout {Company}]") == [("ai", "Write 5 words\nabout {Company}")]
+
+
+def test_direct_placeholder_does_not_span_lines():
+    assert groups("[Title\nmore]") == []
+
+
+def test_unclosed_ai_prompt_runs_to_end_of_text():
+    assert groups("Intro [AI: Write about {Company}") == [("open", "Write about {Company}")]
+
+
+def test_closed_then_unclosed_ai_prompt_are_both_matched():
+    assert groups("[AI: a] [AI: b") == [("ai", "a"), ("open", "b")]
+
+
+def test_fill_placeholders_replaces_every_placeholder():
+    reporter = RecordingReporter()
+    text = "[Title] by [Company]: [AI: Write 5 words about {Company}]"
+    assert app.fill_placeholders(text, resolver(), reporter) == (
+        "Revolutionary Platform by TechCorp: TechCorp"
+    )
+    assert reporter.messages == ["🤖 Generating text: Write 5 words about {Company}..."]
+
+
+def test_fill_placeholders_fills_unclosed_ai_prompt():
+    text = "Intro: [AI: Write 5 words about {Company}"
+    assert app.fill_placeholders(text, resolver(), RecordingReporter()) == "Intro: TechCorp"
+
+
+def test_fill_placeholders_fills_closed_and_unclosed_ai_prompts():
+    text = "[AI: Write 5 words about {Company}] [AI: Write 5 words about {Industry}"
+    assert app.fill_placeholders(text, resolver(), RecordingReporter()) == "TechCorp Cloud Computing"
+
+
+def test_fill_placeholders_leaves_text_without_placeholders_alone():
+    text = "Plain text, no brackets"
+    assert app.fill_placeholders(text, resolver(), RecordingReporter()) == text
+
+
+def test_multiline_ai_prompt_in_table_cell_is_filled():
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    table = slide.shapes.add_table(2, 2, Inches(1), Inches(1), Inches(4), Inches(2)).table
+    cell = table.cell(0, 0)
+    cell.text_frame.text = "[AI: Write 5 words"
+    cell.text_frame.add_paragraph().text = "about {Company}]"
+    static = table.cell(1, 1)
+    static.text = "static"
+
+    assert app.has_bracket(cell._tc)
+    assert not app.has_bracket(static._tc)
+
+    original = cell.text
+    new_text = app.fill_placeholders(original, resolver(), RecordingReporter())
+    app.write_text_preserving_format(cell, original, new_text)
+    assert cell.text == "TechCorp"
+
+    # Survives a save/load round trip
+    out = BytesIO()
+    prs.save(out)
+    reloaded = Presentation(BytesIO(out.getvalue()))
+    reloaded_table = next(s for s in reloaded.slides[0].shapes if s.has_table).table
+    assert reloaded_table.cell(0, 0).text == "TechCorp"
+
+
+# ---------------- _TOKEN_RE / process_placeholder ----------------
+def tokens(text):
+    return [m.group(1) for m in app._TOKEN_RE.finditer(text)]
+
+
+def test_token_forms():
+    assert tokens("{Company}") == ["Company"]
+    assert tokens("{{Company}}") == ["Company"]
+    # Common typos: one brace short on either side
+    assert tokens("{{Company}") == ["Company"]
+    assert tokens("{Company}}") == ["Company"]
+    # Triple braces: the innermost {{...}} is the token, the outer pair stays
+    assert app._TOKEN_RE.sub("X", "{{{Company}}}") == "{X}"
+    # Empty braces and a lone brace are not tokens
+    assert tokens("{} a{b") == []
+
+
+def ai(prompt, row=ROW, missing_columns=None):
+    return app.process_placeholder(
+        f"AI: {prompt}", row, frozenset(row.index), "short", True, missing_columns=missing_columns
+    )
+
+
+def test_tokens_are_replaced_with_row_values():
+    for prompt in (
+        "Write 5 words about {Company}",
+        "Write 5 words about {{Company}}",
+        "Write 5 words about {{Company}",
+        "Write 5 words about {Company}}",
+    ):
+        assert ai(prompt) == "TechCorp", prompt
+
+
+def test_triple_braces_keep_the_outer_pair():
+    # The quoted value is returned verbatim, exposing the substituted prompt text
+    assert ai('Write 5 words about "{{{Company}}}"') == "{TechCorp}"
+
+
+def test_doubled_ai_prefix_is_stripped():
+    assert app.process_placeholder(
+        "AI: AI: Write 5 words about {Company}", ROW, COLUMNS, "short", True, missing_columns=set()
+    ) == "TechCorp"
+
+
+def test_unknown_tokens_are_blanked_and_collected():
+    missing = set()
+    assert ai("Write 5 words about {Nope} {Company}", missing_columns=missing) == "TechCorp"
+    assert missing == {"Nope"}
+
+
+def test_blank_cell_value_becomes_empty_string():
+    row = pd.DataFrame([{"Company": None, "Industry": "Energy"}]).iloc[0]
+    assert ai("Write 5 words about {Company}{Industry}", row=row) == "Energy"
+
+
+# ---------------- Direct placeholders (row map) ----------------
+def test_direct_placeholder_resolves_row_value():
+    assert resolver()("Title") == "Revolutionary Platform"
+    assert resolver()(" Company ") == "TechCorp"
+
+
+def test_numeric_header_matches_its_text():
+    # pandas reads a "2024" header cell as the integer 2024
+    row = pd.DataFrame([{2024: 1.5e6, "Company": "TechCorp"}]).iloc[0]
+    assert 2024 in row.index
+    assert resolver(row)("2024") == "1500000.0"
+    assert resolver(row)('AI: Write 5 words about "{2024}"') == "1500000.0"
+
+
+def test_missing_direct_column_is_blank_or_marked():
+    assert resolver(missing_to_blank=True)("Nope") == ""
+    assert resolver(missing_to_blank=False)("Nope") == "[MISSING COLUMN: Nope]"
+
+
+def test_blank_direct_value_becomes_empty_string():
+    row = pd.DataFrame([{"Title": None, "Company": "TechCorp"}]).iloc[0]
+    assert resolver(row, missing_to_blank=False)("Title") == ""
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in list(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"✅ {name}")
+    print(f"\nAll {len(tests)} checks passed.")